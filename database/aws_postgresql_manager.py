@@ -5,24 +5,63 @@ Handles connection, data import, and maintenance tasks for AWS RDS PostgreSQL
 """
 
 import os
+import io
+import csv
 import json
+import threading
 import psycopg2
-import pandas as pd
-from psycopg2.extras import RealDictCursor, execute_batch
+import psycopg2.errors
+from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool, PoolError
 from contextlib import contextmanager
 import logging
 from datetime import datetime
+from decimal import Decimal, InvalidOperation
 from typing import List, Dict, Optional
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Column order shared by the master catalog CSV and the branded_products COPY
+BRANDED_PRODUCT_COLUMNS = [
+    "product_id", "name", "original_name", "brand", "category", "category_id",
+    "image_filename", "reference_price", "has_offer", "created_date", "data_source"
+]
+
+# Explicit dtypes skip pandas type inference. Prices, flags and dates stay as
+# text so COPY receives the CSV values unchanged and PostgreSQL does the casts.
+BRANDED_PRODUCT_DTYPES = {
+    "product_id": "string",
+    "name": "string",
+    "original_name": "string",
+    "brand": "category",
+    "category": "category",
+    "category_id": "category",
+    "image_filename": "string",
+    "reference_price": "string",
+    "has_offer": "string",
+    "created_date": "string",
+    "data_source": "category"
+}
+
+def _normalize_price(value):
+    """Return the price as a Decimal, or the raw value if it cannot be parsed."""
+    if value is None or isinstance(value, Decimal):
+        return value
+    try:
+        return Decimal(str(value).strip())
+    except InvalidOperation:
+        # Leave it to PostgreSQL to accept or reject the value on INSERT
+        return value
+
 class AWSPostgreSQLManager:
     def __init__(self, config_path: Optional[str] = None):
         """Initialize AWS PostgreSQL connection manager."""
         self.config = self.load_config(config_path)
         self.connection_params = self.get_connection_params()
+        self._pool = None
+        self._pool_lock = threading.Lock()
         
     def load_config(self, config_path: Optional[str]) -> Dict:
         """Load database configuration."""
@@ -43,6 +82,8 @@ class AWSPostgreSQLManager:
                 },
                 "performance": {
                     "batch_insert_size": 1000,
+                    "csv_chunk_size": 100000,
+                    "pool_size": 10,
                     "connection_timeout": 30,
                     "query_timeout": 60
                 }
@@ -75,23 +116,61 @@ class AWSPostgreSQLManager:
         params["sslmode"] = "require"
         params["connect_timeout"] = self.config["database"]["performance"]["connection_timeout"]
         
+        # Keep pooled connections alive through RDS/NAT idle timeouts and cap runaway queries
+        query_timeout_ms = int(self.config["database"]["performance"].get("query_timeout", 60) * 1000)
+        params["keepalives"] = 1
+        params["keepalives_idle"] = 30
+        params["keepalives_interval"] = 10
+        params["keepalives_count"] = 5
+        params["application_name"] = "smart-shopping"
+        params["options"] = (
+            f"-c statement_timeout={query_timeout_ms} "
+            "-c idle_in_transaction_session_timeout=300000"
+        )
+        
         return params
     
+    def get_pool(self) -> ThreadedConnectionPool:
+        """Create the connection pool on first use so warm connections are reused."""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    pool_size = self.config["database"]["performance"].get("pool_size", 10)
+                    self._pool = ThreadedConnectionPool(1, pool_size, **self.connection_params)
+        return self._pool
+    
     @contextmanager
     def get_connection(self):
-        """Context manager for database connections."""
-        conn = None
+        """Context manager for pooled database connections."""
+        pool = self.get_pool()
+        try:
+            conn = pool.getconn()
+        except PoolError as e:
+            raise RuntimeError(
+                f"Database connection pool exhausted ({pool.maxconn} connections in use)"
+            ) from e
+        discard = False
         try:
-            conn = psycopg2.connect(**self.connection_params)
             yield conn
         except Exception as e:
-            if conn:
-                conn.rollback()
+            discard = conn.closed != 0
+            if not discard:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    discard = True
             logger.error(f"Database error: {e}")
             raise
         finally:
-            if conn:
-                conn.close()
+            # Always return the slot, even on KeyboardInterrupt or task cancellation;
+            # putconn rolls back anything left open by read-only callers
+            pool.putconn(conn, close=discard or conn.closed != 0)
+    
+    def close(self):
+        """Close all pooled connections."""
+        if self._pool is not None:
+            self._pool.closeall()
+            self._pool = None
     
     def test_connection(self) -> bool:
         """Test database connection."""
@@ -106,15 +185,30 @@ class AWSPostgreSQLManager:
             logger.error(f"Connection failed: {e}")
             return False
     
-    def setup_database(self, schema_file: str = "database/aws_postgresql_schema.sql"):
-        """Create tables and indexes from schema file."""
+    def setup_database(self, schema_file: str = "database/aws_postgresql_schema.sql",
+                       migrations_file: str = "database/aws_postgresql_migrations.sql"):
+        """Create tables and indexes from schema file, then apply migrations."""
         try:
-            with open(schema_file, 'r') as f:
-                schema_sql = f.read()
-            
             with self.get_connection() as conn:
                 with conn.cursor() as cur:
-                    cur.execute(schema_sql)
+                    # Schema DDL can outlast the pooled session's statement_timeout
+                    cur.execute("SET LOCAL statement_timeout = 0")
+                    
+                    # The base schema is not idempotent, so only run it on an empty
+                    # database; its materialized view is the last object it creates
+                    cur.execute("SELECT to_regclass('public.store_price_comparison')")
+                    if cur.fetchone()[0] is None:
+                        with open(schema_file, 'r') as f:
+                            cur.execute(f.read())
+                        logger.info("Database schema created")
+                    else:
+                        logger.info("Database schema already present, applying migrations only")
+
+                    # Migrations are idempotent and always run, so existing
+                    # databases pick up objects added after their initial setup
+                    with open(migrations_file, 'r') as f:
+                        cur.execute(f.read())
+
                     conn.commit()
                     logger.info("Database schema setup completed")
                     
@@ -124,33 +218,34 @@ class AWSPostgreSQLManager:
     
     def load_branded_products(self, csv_file: str = "database/imports/master_branded_products.csv"):
         """Load master branded products catalog."""
+        # pandas is only needed here; importing it lazily keeps API and crawler start-up light
+        import pandas as pd
+        
         try:
-            df = pd.read_csv(csv_file)
-            logger.info(f"Loading {len(df)} branded products...")
+            chunk_size = self.config["database"]["performance"].get("csv_chunk_size", 100000)
+            copy_sql = f"COPY branded_products ({', '.join(BRANDED_PRODUCT_COLUMNS)}) FROM STDIN WITH (FORMAT CSV)"
+            logger.info(f"Loading branded products from {csv_file}...")
             
             with self.get_connection() as conn:
                 with conn.cursor() as cur:
+                    # The bulk COPY can outlast the pooled session's statement_timeout
+                    cur.execute("SET LOCAL statement_timeout = 0")
+                    
                     # Clear existing data
                     cur.execute("TRUNCATE TABLE branded_products CASCADE")
                     
-                    # Prepare insert query
-                    insert_query = """
-                        INSERT INTO branded_products 
-                        (product_id, name, original_name, brand, category, category_id, 
-                         image_filename, reference_price, has_offer, created_date, data_source)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    """
-                    
-                    # Convert DataFrame to list of tuples
-                    records = df.to_records(index=False)
-                    data = [tuple(record) for record in records]
-                    
-                    # Batch insert
-                    batch_size = self.config["database"]["performance"]["batch_insert_size"]
-                    execute_batch(cur, insert_query, data, page_size=batch_size)
+                    # Stream the CSV through COPY one chunk at a time to keep memory bounded
+                    loaded = 0
+                    for chunk in pd.read_csv(csv_file, usecols=BRANDED_PRODUCT_COLUMNS,
+                                             dtype=BRANDED_PRODUCT_DTYPES, chunksize=chunk_size):
+                        buffer = io.StringIO()
+                        chunk.to_csv(buffer, columns=BRANDED_PRODUCT_COLUMNS, index=False, header=False)
+                        buffer.seek(0)
+                        cur.copy_expert(copy_sql, buffer)
+                        loaded += len(chunk)
                     
                     conn.commit()
-                    logger.info(f"Successfully loaded {len(data)} branded products")
+                    logger.info(f"Successfully loaded {loaded} branded products")
                     
         except Exception as e:
             logger.error(f"Failed to load branded products: {e}")
@@ -161,10 +256,58 @@ class AWSPostgreSQLManager:
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cur:
-                    upsert_query = """
+                    # Prepare data for batch insert; a multi-row ON CONFLICT statement
+                    # cannot touch the same key twice, so the last entry per product wins
+                    data = list({
+                        item['product_id']: (
+                            item['product_id'],
+                            store_name,
+                            _normalize_price(item['price']),
+                            item.get('offer_text'),
+                            item.get('availability', True)
+                        )
+                        for item in prices_data
+                    }.values())
+                    
+                    # Skip rows whose price is unchanged; the upsert would not touch them anyway.
+                    # Prices that did not parse as Decimal always go through to the INSERT.
+                    cur.execute("""
+                        SELECT product_id, current_price FROM store_prices
+                        WHERE store_name = %s AND product_id = ANY(%s)
+                    """, (store_name, [row[0] for row in data]))
+                    existing = dict(cur.fetchall())
+                    changed = [
+                        row for row in data
+                        if row[0] not in existing or not isinstance(row[2], Decimal)
+                        or existing[row[0]] != row[2]
+                    ]
+                    
+                    # Stream the changed rows into a temp table with COPY, then merge in one statement
+                    cur.execute("""
+                        CREATE TEMP TABLE tmp_store_prices (
+                            product_id VARCHAR(12),
+                            store_name VARCHAR(100),
+                            current_price DECIMAL(10,2),
+                            offer_text TEXT,
+                            availability BOOLEAN
+                        ) ON COMMIT DROP
+                    """)
+                    buffer = io.StringIO()
+                    # Write None as an explicit \N marker so empty offer_text stays ''
+                    csv.writer(buffer).writerows(
+                        [r'\N' if value is None else value for value in row] for row in changed
+                    )
+                    buffer.seek(0)
+                    cur.copy_expert(
+                        "COPY tmp_store_prices (product_id, store_name, current_price, offer_text, availability) "
+                        "FROM STDIN WITH (FORMAT CSV, NULL '\\N')",
+                        buffer
+                    )
+                    cur.execute("""
                         INSERT INTO store_prices 
                         (product_id, store_name, current_price, offer_text, availability)
-                        VALUES (%s, %s, %s, %s, %s)
+                        SELECT product_id, store_name, current_price, offer_text, availability
+                        FROM tmp_store_prices
                         ON CONFLICT (product_id, store_name) 
                         DO UPDATE SET
                             current_price = EXCLUDED.current_price,
@@ -172,24 +315,10 @@ class AWSPostgreSQLManager:
                             availability = EXCLUDED.availability,
                             last_updated = CURRENT_TIMESTAMP
                         WHERE store_prices.current_price != EXCLUDED.current_price
-                    """
-                    
-                    # Prepare data for batch insert
-                    data = [
-                        (
-                            item['product_id'],
-                            store_name,
-                            item['price'],
-                            item.get('offer_text'),
-                            item.get('availability', True)
-                        )
-                        for item in prices_data
-                    ]
-                    
-                    execute_batch(cur, upsert_query, data, page_size=1000)
+                    """)
                     conn.commit()
                     
-                    logger.info(f"Updated {len(data)} prices for {store_name}")
+                    logger.info(f"Updated {len(changed)} of {len(data)} prices for {store_name}")
                     
         except Exception as e:
             logger.error(f"Failed to update store prices: {e}")
@@ -200,24 +329,25 @@ class AWSPostgreSQLManager:
         try:
             with self.get_connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                    query = """
-                        SELECT * FROM store_price_comparison
-                        WHERE 1=1
-                    """
+                    conditions = []
                     params = []
                     
                     if brand:
-                        query += " AND brand ILIKE %s"
+                        conditions.append("brand ILIKE %s")
                         params.append(f"%{brand}%")
                     
                     if category:
-                        query += " AND category ILIKE %s"
+                        conditions.append("category ILIKE %s")
                         params.append(f"%{category}%")
                     
+                    query = "SELECT * FROM store_price_comparison"
+                    if conditions:
+                        query += " WHERE " + " AND ".join(conditions)
                     query += " ORDER BY min_price ASC"
                     
+                    # RealDictRow is already a dict, so skip the per-row copy
                     cur.execute(query, params)
-                    return [dict(row) for row in cur.fetchall()]
+                    return cur.fetchall()
                     
         except Exception as e:
             logger.error(f"Failed to get price comparison: {e}")
@@ -228,6 +358,9 @@ class AWSPostgreSQLManager:
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cur:
+                    # View refreshes can outlast the pooled session's statement_timeout
+                    cur.execute("SET LOCAL statement_timeout = 0")
+                    
                     # Refresh materialized view
                     cur.execute("SELECT refresh_price_comparison()")
                     
@@ -249,51 +382,47 @@ class AWSPostgreSQLManager:
         try:
             with self.get_connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                    # Get table sizes
+                    # Get table sizes straight from pg_catalog (filter before joining)
                     cur.execute("""
-                        SELECT 
-                            tablename,
-                            pg_size_pretty(pg_total_relation_size(schemaname||'.'||tablename)) as size,
-                            pg_total_relation_size(schemaname||'.'||tablename) as size_bytes
-                        FROM pg_tables 
-                        WHERE schemaname = 'public'
+                        SELECT
+                            c.relname as tablename,
+                            pg_size_pretty(pg_total_relation_size(c.oid)) as size,
+                            pg_total_relation_size(c.oid) as size_bytes
+                        FROM pg_catalog.pg_class c
+                        JOIN pg_catalog.pg_namespace n ON c.relnamespace = n.oid
+                        WHERE n.nspname = 'public' AND c.relkind = 'r'
                         ORDER BY size_bytes DESC
                     """)
                     tables = [dict(row) for row in cur.fetchall()]
                     
-                    # Get record counts
-                    cur.execute("SELECT COUNT(*) as branded_products FROM branded_products")
-                    branded_count = cur.fetchone()['branded_products']
-                    
-                    cur.execute("SELECT COUNT(*) as store_prices FROM store_prices")
-                    prices_count = cur.fetchone()['store_prices']
-                    
-                    cur.execute("SELECT COUNT(DISTINCT store_name) as stores FROM store_prices")
-                    stores_count = cur.fetchone()['stores']
-                    
-                    # Get user and shopping list stats
-                    cur.execute("SELECT COUNT(*) as users FROM users WHERE is_active = true")
-                    users_count = cur.fetchone()['users']
-                    
-                    cur.execute("SELECT COUNT(*) as shopping_lists FROM shopping_lists")
-                    lists_count = cur.fetchone()['shopping_lists']
-                    
-                    cur.execute("SELECT COUNT(*) as shopping_list_items FROM shopping_list_items")
-                    items_count = cur.fetchone()['shopping_list_items']
-                    
-                    cur.execute("SELECT COUNT(*) as crawler_priorities FROM user_crawler_priorities WHERE last_crawled IS NULL")
-                    pending_priorities = cur.fetchone()['crawler_priorities']
+                    # Get all record counts in a single round-trip
+                    cur.execute("""
+                        SELECT
+                            (SELECT COUNT(*) FROM branded_products) as branded_products,
+                            sp.store_prices,
+                            sp.stores,
+                            (SELECT COUNT(*) FROM users WHERE is_active = true) as users,
+                            (SELECT COUNT(*) FROM shopping_lists) as shopping_lists,
+                            (SELECT COUNT(*) FROM shopping_list_items) as shopping_list_items,
+                            (SELECT COUNT(*) FROM user_crawler_priorities
+                             WHERE last_crawled IS NULL) as crawler_priorities
+                        FROM (
+                            SELECT COUNT(*) as store_prices, COUNT(DISTINCT store_name) as stores
+                            FROM store_prices
+                        ) sp
+                    """)
+                    counts = cur.fetchone()
                     
                     return {
                         "tables": tables,
                         "counts": {
-                            "branded_products": branded_count,
-                            "store_prices": prices_count,
-                            "stores": stores_count,
-                            "active_users": users_count,
-                            "shopping_lists": lists_count,
-                            "shopping_list_items": items_count,
-                            "pending_crawler_priorities": pending_priorities
+                            "branded_products": counts['branded_products'],
+                            "store_prices": counts['store_prices'],
+                            "stores": counts['stores'],
+                            "active_users": counts['users'],
+                            "shopping_lists": counts['shopping_lists'],
+                            "shopping_list_items": counts['shopping_list_items'],
+                            "pending_crawler_priorities": counts['crawler_priorities']
                         },
                         "last_updated": datetime.now().isoformat()
                     }
@@ -323,6 +452,42 @@ class AWSPostgreSQLManager:
             logger.error(f"Failed to create user: {e}")
             raise
 
+    def create_user_with_shopping_list(self, username: str, email: str, password_hash: str,
+                                       list_name: str, items: List[Dict] = None,
+                                       full_name: str = None, description: str = None) -> Dict:
+        """Create a user, their first shopping list and its items in a single round-trip.
+        
+        Each item is a dict with 'name' and optional 'product_id', 'quantity'
+        and 'preferred_stores' keys.
+        """
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                        SELECT new_user_id, new_list_id
+                        FROM create_user_with_list(%s, %s, %s, %s, %s, %s, %s::jsonb)
+                    """, (username, email, password_hash, full_name,
+                          list_name, description, json.dumps(items or [])))
+                    
+                    user_id, list_id = cur.fetchone()
+                    conn.commit()
+                    
+                    logger.info(f"Created user {username} with ID {user_id} and shopping list '{list_name}'")
+                    return {"user_id": user_id, "list_id": list_id}
+                    
+        except psycopg2.errors.UndefinedFunction:
+            # Databases that have not run the migrations yet lack create_user_with_list
+            logger.warning("create_user_with_list not found, falling back to separate inserts")
+            user_id = self.create_user(username, email, password_hash, full_name)
+            list_id = self.create_shopping_list(user_id, list_name, description)
+            for item in items or []:
+                self.add_to_shopping_list(list_id, item['name'], item.get('product_id'),
+                                          item.get('quantity', 1), item.get('preferred_stores'))
+            return {"user_id": user_id, "list_id": list_id}
+        except Exception as e:
+            logger.error(f"Failed to create user with shopping list: {e}")
+            raise
+
     def get_user_by_username(self, username: str) -> Optional[Dict]:
         """Get user by username."""
         try:
@@ -391,8 +556,9 @@ class AWSPostgreSQLManager:
         try:
             with self.get_connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    # RealDictRow is already a dict, so skip the per-row copy
                     cur.execute("SELECT * FROM get_top_crawler_priorities(%s)", (limit,))
-                    return [dict(row) for row in cur.fetchall()]
+                    return cur.fetchall()
                     
         except Exception as e:
             logger.error(f"Failed to get crawler priorities: {e}")
@@ -0,0 +1,73 @@
+-- Incremental migrations for the AWS PostgreSQL schema
+-- Applied by setup_database() on every run, after aws_postgresql_schema.sql on
+-- fresh databases, so every statement here must be idempotent.
+-- Add new schema objects here rather than to aws_postgresql_schema.sql.
+
+-- Trigram indexes for ILIKE '%term%' searches
+CREATE EXTENSION IF NOT EXISTS "pg_trgm";
+
+CREATE INDEX IF NOT EXISTS idx_branded_products_name_trgm
+    ON branded_products USING gin(name gin_trgm_ops);
+
+-- Trigram indexes so the ILIKE '%...%' filters in get_price_comparison avoid a full scan
+CREATE INDEX IF NOT EXISTS idx_price_comparison_brand_trgm
+    ON store_price_comparison USING gin(brand gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_price_comparison_category_trgm
+    ON store_price_comparison USING gin(category gin_trgm_ops);
+
+-- Function to sign up a user with an initial shopping list in one round-trip
+CREATE OR REPLACE FUNCTION create_user_with_list(
+    username_param VARCHAR,
+    email_param VARCHAR,
+    password_hash_param VARCHAR,
+    full_name_param VARCHAR,
+    list_name VARCHAR,
+    list_description TEXT,
+    items JSONB DEFAULT '[]'::jsonb
+) RETURNS TABLE(
+    new_user_id INTEGER,
+    new_list_id INTEGER
+) AS $$
+BEGIN
+    INSERT INTO users (username, email, password_hash, full_name)
+    VALUES (username_param, email_param, password_hash_param, full_name_param)
+    RETURNING id INTO new_user_id;
+    
+    INSERT INTO shopping_lists (user_id, name, description)
+    VALUES (new_user_id, list_name, list_description)
+    RETURNING id INTO new_list_id;
+    
+    -- Add the initial items (the list item trigger still creates crawler priorities)
+    INSERT INTO shopping_list_items (list_id, product_id, product_name, quantity, preferred_stores)
+    SELECT 
+        new_list_id,
+        item->>'product_id',
+        item->>'name',
+        COALESCE((item->>'quantity')::INTEGER, 1),
+        CASE WHEN item ? 'preferred_stores'
+            THEN ARRAY(SELECT jsonb_array_elements_text(item->'preferred_stores'))
+        END
+    FROM jsonb_array_elements(items) as item;
+    
+    RETURN NEXT;
+END;
+$$ LANGUAGE plpgsql;
+
+-- The crawler upserts national_brands with ON CONFLICT (product_id), which needs a
+-- unique index on that column. The table is created outside this schema, so only
+-- add the index when the table exists and no unique index/PK covers product_id.
+DO $$
+BEGIN
+    IF to_regclass('public.national_brands') IS NOT NULL AND NOT EXISTS (
+        SELECT 1
+        FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+        WHERE i.indrelid = 'public.national_brands'::regclass
+          AND i.indisunique
+          AND i.indnkeyatts = 1
+          AND a.attname = 'product_id'
+    ) THEN
+        CREATE UNIQUE INDEX national_brands_product_id_key ON national_brands (product_id);
+    END IF;
+END;
+$$;
@@ -5,18 +5,51 @@ Creates a clean public repository with only essential code
 """
 
 import os
+import sys
 import shutil
+import argparse
+import stat
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+def _reset_dir(path):
+    """Recreate an empty directory, deleting the old contents in the background"""
+    if path.exists():
+        # Move into a fresh temp dir so a stale trash dir left by a crash can't collide
+        trash = Path(tempfile.mkdtemp(prefix=f"{path.name}.old.", dir=path.parent))
+        os.replace(path, trash / path.name)
+        # Non-daemon so the old tree is fully removed before the script exits
+        threading.Thread(target=shutil.rmtree, args=(trash,), kwargs={'ignore_errors': True}).start()
+    path.mkdir()
+
+def _copy_entry(source, dest, source_stat):
+    """Copy a single file or directory, reusing the caller's stat of the source"""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if stat.S_ISDIR(source_stat.st_mode):
+        shutil.copytree(source, dest, dirs_exist_ok=True)
+    else:
+        # Equivalent to copy2, without copystat stat-ing the source again
+        shutil.copyfile(source, dest)
+        os.chmod(dest, stat.S_IMODE(source_stat.st_mode))
+        os.utime(dest, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+
+def _copy_many(entries):
+    """Copy (source, dest, source_stat) entries concurrently; copies are I/O bound so threads suffice"""
+    if not entries:
+        return
+    with ThreadPoolExecutor(max_workers=min(32, len(entries))) as executor:
+        # Consuming the results re-raises the first copy error, if any
+        list(executor.map(lambda entry: _copy_entry(*entry), entries))
+
 def create_public_repository():
     """Create a clean public repository with only essential files"""
     print("🧹 Creating clean public repository...")
     
     # Create clean repo folder
     public_repo = Path("../smart-shopping-platform-public")
-    if public_repo.exists():
-        shutil.rmtree(public_repo)
-    public_repo.mkdir()
+    _reset_dir(public_repo)
     
     # Files that should be PUBLIC (essential code only)
     public_files = [
@@ -38,6 +71,7 @@ def create_public_repository():
         
         # Database (schema only)
         "database/aws_postgresql_schema.sql",
+        "database/aws_postgresql_migrations.sql",
         "database/minimal_schema.sql",
         "database/README.md",
         "database/imports/database_schema.sql",
@@ -75,16 +109,16 @@ def create_public_repository():
     
     # Copy public files
     print("\n📁 Copying public files:")
+    found_files = {}
     for file_path in public_files:
-        source = base_path / file_path
-        dest = public_repo / file_path
-        
-        if source.exists():
-            dest.parent.mkdir(parents=True, exist_ok=True)
-            if source.is_dir():
-                shutil.copytree(source, dest, dirs_exist_ok=True)
-            else:
-                shutil.copy2(source, dest)
+        try:
+            found_files[file_path] = os.stat(base_path / file_path)
+        except FileNotFoundError:
+            continue
+    _copy_many([(base_path / file_path, public_repo / file_path, source_stat)
+                for file_path, source_stat in found_files.items()])
+    for file_path in public_files:
+        if file_path in found_files:
             print(f"  ✅ {file_path}")
         else:
             print(f"  ⚠️  {file_path} (not found)")
@@ -151,6 +185,7 @@ A modern, secure e-commerce platform built with Python FastAPI and PostgreSQL.
    ```bash
    # Run the SQL schema files in database/
    psql -h your_host -U your_user -d your_db -f database/aws_postgresql_schema.sql
+   psql -h your_host -U your_user -d your_db -f database/aws_postgresql_migrations.sql
    ```
 
 5. **Run the application**:
@@ -210,8 +245,7 @@ Professional E-commerce Solutions
 *Built with ❤️ for modern e-commerce*
 """
     
-    with open(repo_path / "README.md", 'w', encoding='utf-8') as f:
-        f.write(readme_content)
+    (repo_path / "README.md").write_text(readme_content, encoding='utf-8')
     
     print("  ✅ Created public README.md")
 
@@ -284,8 +318,7 @@ pids
 *.pid.lock
 """
     
-    with open(repo_path / ".gitignore", 'w', encoding='utf-8') as f:
-        f.write(gitignore_content)
+    (repo_path / ".gitignore").write_text(gitignore_content, encoding='utf-8')
     
     print("  ✅ Created public .gitignore")
 
@@ -321,17 +354,28 @@ def show_file_categorization():
             print(f"    🔒 {file}")
 
 def main():
+    parser = argparse.ArgumentParser(description="Separate public code from private reference files")
+    parser.add_argument("--choice", choices=["1", "2", "3"],
+                        help="Run a menu option without prompting (for scripted use)")
+    args = parser.parse_args()
+    
     print("🎯 Repository Cleanup - Public vs Private Files")
     print("=" * 55)
     
     show_file_categorization()
     
-    print("\n🤔 What would you like to do?")
-    print("1. 🌐 CREATE CLEAN PUBLIC REPO - Only essential code")
-    print("2. 📊 SHOW ANALYSIS ONLY - See what would be public/private")
-    print("3. 🔒 CURRENT REPO TO PRIVATE - Keep current as personal reference")
-    
-    choice = input("\nEnter your choice (1-3): ").strip()
+    if args.choice:
+        choice = args.choice
+    elif sys.stdin.isatty():
+        print("\n🤔 What would you like to do?")
+        print("1. 🌐 CREATE CLEAN PUBLIC REPO - Only essential code")
+        print("2. 📊 SHOW ANALYSIS ONLY - See what would be public/private")
+        print("3. 🔒 CURRENT REPO TO PRIVATE - Keep current as personal reference")
+        
+        choice = input("\nEnter your choice (1-3): ").strip()
+    else:
+        print("\n❌ No terminal to prompt on. Pass --choice 1, 2 or 3.")
+        sys.exit(2)
     
     if choice == "1":
         print("\n🌐 Creating clean public repository...")
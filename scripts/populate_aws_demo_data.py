@@ -8,8 +8,14 @@ import os
 import json
 import random
 from datetime import datetime, timedelta
+from psycopg2.extras import execute_values
 from database.aws_postgresql_manager import AWSPostgreSQLManager
 
+def store_slugs(store):
+    """Return the (file, url) slugs for a store name"""
+    lowered = store.lower()
+    return lowered.replace(" ", "_"), lowered.replace(" ", "-")
+
 def populate_store_promotions(db_manager):
     """Create store promotions using existing store data from AWS PostgreSQL"""
     print("🎯 Creating store promotions...")
@@ -19,6 +25,7 @@ def populate_store_promotions(db_manager):
             # Get existing stores from store_prices table
             cur.execute("SELECT DISTINCT store_name FROM store_prices LIMIT 10")
             stores = [row[0] for row in cur.fetchall()]
+            slugs = {store: store_slugs(store) for store in stores}
             
             promotions = []
             
@@ -29,8 +36,8 @@ def populate_store_promotions(db_manager):
                     'promotion_type': 'sponsored_banner',
                     'title': f'{store} - Best Prices Guaranteed!',
                     'description': f'Save up to 30% on thousands of products at {store}. Free delivery on orders over £40.',
-                    'image_url': f'/static/images/banners/{store.lower().replace(" ", "_")}_banner.jpg',
-                    'target_url': f'/store/{store.lower().replace(" ", "-")}',
+                    'image_url': f'/static/images/banners/{slugs[store][0]}_banner.jpg',
+                    'target_url': f'/store/{slugs[store][1]}',
                     'promotion_data': json.dumps({
                         'discount_percentage': random.randint(10, 30),
                         'min_order_value': 40,
@@ -51,8 +58,8 @@ def populate_store_promotions(db_manager):
                     'promotion_type': 'product_highlight',
                     'title': f'Featured Deals at {store}',
                     'description': f'Hand-picked deals and offers from {store}',
-                    'image_url': f'/static/images/offers/{store.lower().replace(" ", "_")}_offers.jpg',
-                    'target_url': f'/store/{store.lower().replace(" ", "-")}/offers',
+                    'image_url': f'/static/images/offers/{slugs[store][0]}_offers.jpg',
+                    'target_url': f'/store/{slugs[store][1]}/offers',
                     'promotion_data': json.dumps({
                         'featured_products': ['bread', 'milk', 'chicken', 'pasta'],
                         'offer_type': 'percentage',
@@ -67,20 +74,22 @@ def populate_store_promotions(db_manager):
                 promotions.append(promotion)
             
             # Insert promotions
-            for promo in promotions:
-                cur.execute("""
-                    INSERT INTO store_promotions 
-                    (store_name, promotion_type, title, description, image_url, target_url, 
-                     promotion_data, display_priority, max_impressions, cost_per_impression, 
-                     start_date, end_date, is_active)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """, (
+            execute_values(cur, """
+                INSERT INTO store_promotions 
+                (store_name, promotion_type, title, description, image_url, target_url, 
+                 promotion_data, display_priority, max_impressions, cost_per_impression, 
+                 start_date, end_date, is_active)
+                VALUES %s
+            """, [
+                (
                     promo['store_name'], promo['promotion_type'], promo['title'], 
                     promo['description'], promo['image_url'], promo['target_url'],
                     promo['promotion_data'], promo['display_priority'], 
                     promo['max_impressions'], promo['cost_per_impression'],
                     promo['start_date'], promo['end_date'], True
-                ))
+                )
+                for promo in promotions
+            ])
             
             conn.commit()
             print(f"✅ Created {len(promotions)} store promotions")
@@ -119,18 +128,20 @@ def populate_product_availability(db_manager):
                     })
             
             # Insert availability data
-            for record in availability_records:
-                cur.execute("""
-                    INSERT INTO product_availability 
-                    (product_id, store_name, location_identifier, is_available, 
-                     stock_level, delivery_available, click_collect_available)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (product_id, store_name, location_identifier) DO NOTHING
-                """, (
+            execute_values(cur, """
+                INSERT INTO product_availability 
+                (product_id, store_name, location_identifier, is_available, 
+                 stock_level, delivery_available, click_collect_available)
+                VALUES %s
+                ON CONFLICT (product_id, store_name, location_identifier) DO NOTHING
+            """, [
+                (
                     record['product_id'], record['store_name'], record['location_identifier'],
                     record['is_available'], record['stock_level'], 
                     record['delivery_available'], record['click_collect_available']
-                ))
+                )
+                for record in availability_records
+            ], page_size=1000)
             
             conn.commit()
             print(f"✅ Created availability data for {len(availability_records)} product-store-location combinations")
@@ -159,21 +170,23 @@ def create_demo_users_and_lists(db_manager):
                 }
             ]
             
-            user_ids = []
-            for user in demo_users:
-                cur.execute("""
-                    INSERT INTO users (username, email, password_hash, full_name, is_premium)
-                    VALUES (%s, %s, %s, %s, %s)
-                    ON CONFLICT (username) DO UPDATE SET
-                    email = EXCLUDED.email,
-                    full_name = EXCLUDED.full_name,
-                    is_premium = EXCLUDED.is_premium
-                    RETURNING id
-                """, (user['username'], user['email'], user['password_hash'], 
-                      user['full_name'], user['is_premium']))
-                
-                user_id = cur.fetchone()[0]
-                user_ids.append(user_id)
+            # RETURNING order is not guaranteed, so map the ids back by username
+            returned = execute_values(cur, """
+                INSERT INTO users (username, email, password_hash, full_name, is_premium)
+                VALUES %s
+                ON CONFLICT (username) DO UPDATE SET
+                email = EXCLUDED.email,
+                full_name = EXCLUDED.full_name,
+                is_premium = EXCLUDED.is_premium
+                RETURNING username, id
+            """, [
+                (user['username'], user['email'], user['password_hash'], 
+                 user['full_name'], user['is_premium'])
+                for user in demo_users
+            ], fetch=True)
+            
+            ids_by_username = dict(returned)
+            user_ids = [ids_by_username[user['username']] for user in demo_users]
             
             # Create user locations
             locations = [
@@ -200,38 +213,42 @@ def create_demo_users_and_lists(db_manager):
                 }
             ]
             
-            for location in locations:
-                cur.execute("""
-                    INSERT INTO user_locations 
-                    (user_id, location_name, postcode, is_primary, available_stores)
-                    VALUES (%s, %s, %s, %s, %s)
-                    ON CONFLICT DO NOTHING
-                """, (location['user_id'], location['location_name'], 
-                      location['postcode'], location['is_primary'], location['available_stores']))
+            execute_values(cur, """
+                INSERT INTO user_locations 
+                (user_id, location_name, postcode, is_primary, available_stores)
+                VALUES %s
+                ON CONFLICT DO NOTHING
+            """, [
+                (location['user_id'], location['location_name'], 
+                 location['postcode'], location['is_primary'], location['available_stores'])
+                for location in locations
+            ])
             
             # Get some real product names for shopping lists
             cur.execute("SELECT name FROM branded_products LIMIT 20")
             available_products = [row[0] for row in cur.fetchall()]
             
-            # Create shopping lists
-            for user_id in user_ids:
-                # Weekly shopping list
-                cur.execute("""
-                    INSERT INTO shopping_lists (user_id, name, description)
-                    VALUES (%s, %s, %s)
-                    RETURNING id
-                """, (user_id, 'Weekly Shopping', 'Regular weekly groceries'))
-                
-                list_id = cur.fetchone()[0]
-                
-                # Add items to the list
-                for product in random.sample(available_products, min(8, len(available_products))):
-                    cur.execute("""
-                        INSERT INTO shopping_list_items 
-                        (list_id, product_name, quantity, preferred_stores)
-                        VALUES (%s, %s, %s, %s)
-                    """, (list_id, product, random.randint(1, 3), 
-                          random.sample(['Tesco', 'ASDA', 'Sainsburys', 'Morrisons'], 2)))
+            # Create a weekly shopping list per user
+            list_ids = execute_values(cur, """
+                INSERT INTO shopping_lists (user_id, name, description)
+                VALUES %s
+                RETURNING id
+            """, [
+                (user_id, 'Weekly Shopping', 'Regular weekly groceries')
+                for user_id in user_ids
+            ], fetch=True)
+            
+            # Add items to the lists
+            execute_values(cur, """
+                INSERT INTO shopping_list_items 
+                (list_id, product_name, quantity, preferred_stores)
+                VALUES %s
+            """, [
+                (list_id, product, random.randint(1, 3), 
+                 random.sample(['Tesco', 'ASDA', 'Sainsburys', 'Morrisons'], 2))
+                for (list_id,) in list_ids
+                for product in random.sample(available_products, min(8, len(available_products)))
+            ])
             
             # Create shopping list templates
             template_items = [
@@ -241,12 +258,15 @@ def create_demo_users_and_lists(db_manager):
                 {'name': 'Chicken', 'quantity': 1, 'preferred_stores': ['Sainsburys', 'Morrisons']}
             ]
             
-            for user_id in user_ids:
-                cur.execute("""
-                    INSERT INTO shopping_list_templates 
-                    (user_id, template_name, base_items, frequency, auto_create)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (user_id, 'Weekly Essentials', json.dumps(template_items), 'weekly', False))
+            template_json = json.dumps(template_items)
+            execute_values(cur, """
+                INSERT INTO shopping_list_templates 
+                (user_id, template_name, base_items, frequency, auto_create)
+                VALUES %s
+            """, [
+                (user_id, 'Weekly Essentials', template_json, 'weekly', False)
+                for user_id in user_ids
+            ])
             
             conn.commit()
             print(f"✅ Created {len(demo_users)} demo users with locations, lists, and templates")
@@ -262,22 +282,25 @@ def create_savings_analysis_data(db_manager):
             user_ids = [row[0] for row in cur.fetchall()]
             
             # Create savings analysis records
-            for user_id in user_ids:
-                analysis_data = {
-                    'tesco': {'total': 45.67, 'savings': 0},
-                    'asda': {'total': 42.30, 'savings': 3.37},
-                    'sainsburys': {'total': 48.99, 'savings': -3.32},
-                    'morrisons': {'total': 44.15, 'savings': 1.52}
-                }
-                
-                cur.execute("""
-                    INSERT INTO savings_analysis 
-                    (user_id, analysis_type, comparison_data, potential_savings, recommended_action)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (
-                    user_id, 'list_comparison', json.dumps(analysis_data), 
+            analysis_data = {
+                'tesco': {'total': 45.67, 'savings': 0},
+                'asda': {'total': 42.30, 'savings': 3.37},
+                'sainsburys': {'total': 48.99, 'savings': -3.32},
+                'morrisons': {'total': 44.15, 'savings': 1.52}
+            }
+            analysis_json = json.dumps(analysis_data)
+            
+            execute_values(cur, """
+                INSERT INTO savings_analysis 
+                (user_id, analysis_type, comparison_data, potential_savings, recommended_action)
+                VALUES %s
+            """, [
+                (
+                    user_id, 'list_comparison', analysis_json, 
                     3.37, 'Switch to ASDA to save £3.37 on your weekly shop'
-                ))
+                )
+                for user_id in user_ids
+            ])
             
             conn.commit()
             print(f"✅ Created savings analysis for {len(user_ids)} users")
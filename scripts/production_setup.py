@@ -11,7 +11,7 @@ Usage: python scripts/production_setup.py
 import os
 import sys
 import subprocess
-import psycopg2
+import tempfile
 from pathlib import Path
 import logging
 from dotenv import load_dotenv
@@ -78,14 +78,13 @@ class ProductionSetup:
         logger.info("🔗 Testing AWS PostgreSQL database connection...")
         
         try:
-            conn = psycopg2.connect(
-                host=os.getenv('AWS_DB_HOST'),
-                port=os.getenv('AWS_DB_PORT'),
-                database=os.getenv('AWS_DB_NAME'),
-                user=os.getenv('AWS_DB_USER'),
-                password=os.getenv('AWS_DB_PASSWORD')
-            )
-            conn.close()
+            # Go through the shared manager so the check uses the same
+            # connection settings (sslmode, timeouts) as the application
+            sys.path.append(str(self.project_root))
+            from database.aws_postgresql_manager import AWSPostgreSQLManager
+            if not AWSPostgreSQLManager().test_connection():
+                logger.error("❌ Database connection failed")
+                return False
             logger.info("✅ Database connection successful")
             return True
         except Exception as e:
@@ -156,8 +155,19 @@ LOG_FILE=smart_shopping_production.log
 """
         
         try:
-            with open(self.project_root / 'config' / 'production.env', 'w') as f:
-                f.write(config_content)
+            # Write to a temp file and swap it in, so an interrupted run never leaves a
+            # half-written config (mkstemp also keeps the credentials file owner-only)
+            config_dir = self.project_root / 'config'
+            fd, tmp_path = tempfile.mkstemp(dir=config_dir, prefix='.production.env.')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(config_content.encode('utf-8'))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, config_dir / 'production.env')
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
             logger.info("✅ Production configuration created")
             return True
         except Exception as e:
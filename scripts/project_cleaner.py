@@ -10,8 +10,17 @@ Ensures the project remains clean and secure by checking for:
 import os
 import glob
 import re
+import fnmatch
+import shutil
 from pathlib import Path
 
+# Hardcoded credential assignments, compiled once into a single alternation
+SECRET_ASSIGNMENT_RE = re.compile(
+    r'(?:aws_access_key_id|aws_secret_access_key|password|secret|token|key)'
+    r'\s*=\s*["\'][^"\']+["\']',
+    re.IGNORECASE
+)
+
 class ProjectCleaner:
     def __init__(self, project_root="."):
         self.project_root = Path(project_root).resolve()
@@ -34,20 +43,30 @@ class ProjectCleaner:
             "node_modules/", "dist/", "build/"
         ]
     
+    def _walk_project(self):
+        """Walk the project tree once with os.scandir, yielding every DirEntry"""
+        stack = [str(self.project_root)]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as entries:
+                    for entry in entries:
+                        yield entry
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+            except OSError:  # Directory removed during cleanup or unreadable
+                continue
+    
     def scan_sensitive_files(self):
         """Scan for files that contain sensitive information"""
         print("🔍 Scanning for sensitive files...")
         sensitive_files = []
         
-        for pattern in self.sensitive_patterns:
-            if pattern.startswith("!"):  # Skip exclusions
-                continue
-                
-            matches = list(self.project_root.glob(f"**/{pattern}"))
-            for match in matches:
-                if match.is_file():
-                    relative_path = match.relative_to(self.project_root)
-                    sensitive_files.append(str(relative_path))
+        file_patterns = [pattern for pattern in self.sensitive_patterns
+                         if not pattern.startswith("!") and not pattern.endswith("/")]  # Skip exclusions
+        
+        for entry in self._walk_project():
+            if entry.is_file() and any(fnmatch.fnmatch(entry.name, pattern) for pattern in file_patterns):
+                sensitive_files.append(os.path.relpath(entry.path, self.project_root))
         
         return sensitive_files
     
@@ -75,34 +94,22 @@ class ProjectCleaner:
         """Scan code files for hardcoded secrets"""
         print("🔍 Scanning for hardcoded secrets...")
         
-        secret_patterns = [
-            r'password\s*=\s*["\'][^"\']+["\']',
-            r'secret\s*=\s*["\'][^"\']+["\']',
-            r'token\s*=\s*["\'][^"\']+["\']',
-            r'key\s*=\s*["\'][^"\']+["\']',
-            r'aws_access_key_id\s*=\s*["\'][^"\']+["\']',
-            r'aws_secret_access_key\s*=\s*["\'][^"\']+["\']'
-        ]
-        
         issues = []
-        code_files = list(self.project_root.glob("**/*.py")) + \
-                    list(self.project_root.glob("**/*.js")) + \
-                    list(self.project_root.glob("**/*.sh"))
+        code_files = [entry.path for entry in self._walk_project()
+                      if entry.name.endswith((".py", ".js", ".sh")) and entry.is_file()]
         
         for file_path in code_files:
-            if ".git" in str(file_path) or "node_modules" in str(file_path):
+            if ".git" in file_path or "node_modules" in file_path:
                 continue
                 
             try:
                 with open(file_path, 'r', encoding='utf-8') as f:
                     content = f.read()
                     
-                for pattern in secret_patterns:
-                    matches = re.finditer(pattern, content, re.IGNORECASE)
-                    for match in matches:
-                        if "os.getenv" not in match.group() and "environment" not in match.group().lower():
-                            relative_path = file_path.relative_to(self.project_root)
-                            issues.append(f"{relative_path}: {match.group()}")
+                for match in SECRET_ASSIGNMENT_RE.finditer(content):
+                    if "os.getenv" not in match.group() and "environment" not in match.group().lower():
+                        relative_path = os.path.relpath(file_path, self.project_root)
+                        issues.append(f"{relative_path}: {match.group()}")
             except:
                 continue
         
@@ -113,19 +120,20 @@ class ProjectCleaner:
         print("🧹 Cleaning up temporary files...")
         cleaned = []
         
-        for pattern in self.cleanup_patterns:
-            matches = list(self.project_root.glob(f"**/{pattern}"))
-            for match in matches:
-                try:
-                    if match.is_file():
-                        match.unlink()
-                        cleaned.append(str(match.relative_to(self.project_root)))
-                    elif match.is_dir():
-                        import shutil
-                        shutil.rmtree(match)
-                        cleaned.append(str(match.relative_to(self.project_root)))
-                except:
-                    continue
+        dir_patterns = [pattern.rstrip("/") for pattern in self.cleanup_patterns]
+        file_patterns = [pattern for pattern in self.cleanup_patterns if not pattern.endswith("/")]
+        
+        for entry in self._walk_project():
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if any(fnmatch.fnmatch(entry.name, pattern) for pattern in dir_patterns):
+                        shutil.rmtree(entry.path)
+                        cleaned.append(os.path.relpath(entry.path, self.project_root))
+                elif any(fnmatch.fnmatch(entry.name, pattern) for pattern in file_patterns):
+                    os.unlink(entry.path)
+                    cleaned.append(os.path.relpath(entry.path, self.project_root))
+            except:
+                continue
         
         return cleaned
     
@@ -5,15 +5,16 @@ Quick Test and Start for Secure Smart Shopping Platform
 
 import os
 import sys
+import subprocess
 from dotenv import load_dotenv
 
+# Load environment once at import
+load_dotenv()
+
 def test_setup():
     """Test the setup quickly"""
     print("🔧 Testing Smart Shopping Platform Setup...")
     
-    # Load environment
-    load_dotenv()
-    
     # Test environment variables
     aws_vars = ['AWS_DB_HOST', 'AWS_DB_PORT', 'AWS_DB_NAME', 'AWS_DB_USER', 'AWS_DB_PASSWORD']
     missing = [var for var in aws_vars if not os.getenv(var)]
@@ -59,7 +60,11 @@ def start_server():
     print("\n🛑 Press Ctrl+C to stop\n")
     
     try:
-        os.system("uvicorn secure_aws_shopping:app --host 0.0.0.0 --port 8000 --reload")
+        # Run uvicorn directly with an argv list (no intermediate shell), using this interpreter
+        subprocess.run([
+            sys.executable, "-m", "uvicorn", "secure_aws_shopping:app",
+            "--host", "0.0.0.0", "--port", "8000", "--reload"
+        ])
     except KeyboardInterrupt:
         print("\n🛑 Server stopped by user")
 
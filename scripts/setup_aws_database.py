@@ -223,34 +223,20 @@ def create_sample_data():
         password_hash = hashlib.sha256("testpassword123".encode()).hexdigest()
         
         try:
-            user_id = db.create_user(
+            # Create sample user, shopping list and items in one round-trip
+            created = db.create_user_with_shopping_list(
                 username="testuser", 
                 email="test@example.com", 
                 password_hash=password_hash,
-                full_name="Test User"
-            )
-            
-            # Create sample shopping list
-            list_id = db.create_shopping_list(
-                user_id=user_id,
-                name="Weekly Groceries",
-                description="Test shopping list"
-            )
-            
-            # Add sample items
-            db.add_to_shopping_list(
-                list_id=list_id,
-                product_name="Coca Cola 2L",
-                quantity=2,
-                preferred_stores=["tesco", "morrisons"]
-            )
-            
-            db.add_to_shopping_list(
-                list_id=list_id,
-                product_name="Bread White Loaf",
-                quantity=1,
-                preferred_stores=["tesco"]
+                full_name="Test User",
+                list_name="Weekly Groceries",
+                description="Test shopping list",
+                items=[
+                    {"name": "Coca Cola 2L", "quantity": 2, "preferred_stores": ["tesco", "morrisons"]},
+                    {"name": "Bread White Loaf", "quantity": 1, "preferred_stores": ["tesco"]}
+                ]
             )
+            user_id, list_id = created["user_id"], created["list_id"]
             
             print("✅ Sample data created successfully")
             print(f"   - Test user: testuser (ID: {user_id})")
@@ -21,9 +21,12 @@ from dotenv import load_dotenv
 
 class DataFlowTester:
     """Test complete data flow from frontend to AWS database"""
-      def __init__(self):
+    
+    def __init__(self):
         load_dotenv()
         self.base_url = "http://localhost:8888"
+        # One keep-alive session for every API call in the run
+        self.session = requests.Session()
         self.test_user_email = f"test_user_{int(time.time())}@example.com"
         self.test_password = os.getenv("TEST_PASSWORD", "TempTestPass123!")
         self.access_token = None
@@ -53,7 +56,7 @@ class DataFlowTester:
         print("🚀 Testing FastAPI server...")
         
         try:
-            response = requests.get(f"{self.base_url}/admin/docs", timeout=5)
+            response = self.session.get(f"{self.base_url}/admin/docs", timeout=5)
             if response.status_code == 200:
                 print("✅ FastAPI server is running")
                 return True
@@ -79,7 +82,7 @@ class DataFlowTester:
         }
         
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/auth/register",
                 json=user_data,
                 headers={"Content-Type": "application/json"}
@@ -114,7 +117,7 @@ class DataFlowTester:
         }
         
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/auth/login",
                 json=login_data,
                 headers={"Content-Type": "application/json"}
@@ -154,7 +157,7 @@ class DataFlowTester:
         }
         
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/api/shopping-lists",
                 json=list_data,
                 headers=headers
@@ -189,8 +192,14 @@ class DataFlowTester:
         try:
             with self.db_manager.get_connection() as conn:
                 with conn.cursor() as cur:
-                    # Check if user exists in database
-                    cur.execute("SELECT id, email, full_name FROM users WHERE id = %s", (self.user_id,))
+                    # Fetch the user, their list count and activity count in one round-trip
+                    cur.execute("""
+                        SELECT u.id, u.email, u.full_name,
+                               (SELECT COUNT(*) FROM shopping_lists WHERE user_id = u.id),
+                               (SELECT COUNT(*) FROM user_activity WHERE user_id = u.id)
+                        FROM users u
+                        WHERE u.id = %s
+                    """, (self.user_id,))
                     user_row = cur.fetchone()
                     
                     if user_row:
@@ -199,19 +208,13 @@ class DataFlowTester:
                         print("❌ User not found in database")
                         return False
                     
-                    # Check if shopping lists exist
-                    cur.execute("SELECT COUNT(*) FROM shopping_lists WHERE user_id = %s", (self.user_id,))
-                    list_count = cur.fetchone()[0]
+                    list_count, activity_count = user_row[3], user_row[4]
                     
                     if list_count > 0:
                         print(f"✅ Found {list_count} shopping list(s) in database")
                     else:
                         print("⚠️ No shopping lists found in database")
                     
-                    # Check user activity
-                    cur.execute("SELECT COUNT(*) FROM user_activity WHERE user_id = %s", (self.user_id,))
-                    activity_count = cur.fetchone()[0]
-                    
                     if activity_count > 0:
                         print(f"✅ Found {activity_count} user activity record(s)")
                     else:
@@ -291,6 +294,7 @@ class DataFlowTester:
         
         # Always cleanup
         self.cleanup_test_data()
+        self.session.close()
         
         return all_passed
 
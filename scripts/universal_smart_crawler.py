@@ -16,12 +16,19 @@ Architecture:
 """
 
 import os
+import io
+import re
+import csv
 import json
 import asyncio
+import hashlib
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2 import sql
+from psycopg2.extras import RealDictCursor, execute_values
 from decimal import Decimal, ROUND_HALF_UP
-from datetime import datetime, date
+from datetime import date
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 from dotenv import load_dotenv
@@ -29,7 +36,26 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
-@dataclass
+# Database connection - AWS configuration, read once per process
+DB_CONFIG = {
+    'host': os.getenv('AWS_DB_HOST'),
+    'database': os.getenv('AWS_DB_NAME'), 
+    'user': os.getenv('AWS_DB_USER'),
+    'password': os.getenv('AWS_DB_PASSWORD'),
+    'port': int(os.getenv('AWS_DB_PORT', 5432)),
+    'sslmode': 'require'
+}
+
+# "was £X" in (lower-cased) offer text, compiled once for the per-product loop
+WAS_PRICE_RE = re.compile(r'was\s*£?(\d+\.?\d*)')
+
+@lru_cache(maxsize=None)
+def product_id_for(store_key: str, name: str) -> str:
+    """Stable product ID from the product name (same on every run, unlike hash())"""
+    digest = hashlib.blake2b(name.encode('utf-8'), digest_size=4).digest()
+    return f"{store_key}_{int.from_bytes(digest, 'big') % 1000000}"
+
+@dataclass(slots=True)
 class ProductPrice:
     """Product price data structure"""
     product_id: str
@@ -47,17 +73,11 @@ class UniversalSmartCrawler:
     def __init__(self, store_name: str):
         self.store_name = store_name.lower()
         self.store_table = f"{self.store_name}_national_prices"
+        self.store_table_sql = sql.Identifier(self.store_table)
         self.connection = None
         self.session = None
-          # Database connection - AWS configuration
-        self.db_config = {
-            'host': os.getenv('AWS_DB_HOST'),
-            'database': os.getenv('AWS_DB_NAME'), 
-            'user': os.getenv('AWS_DB_USER'),
-            'password': os.getenv('AWS_DB_PASSWORD'),
-            'port': int(os.getenv('AWS_DB_PORT', 5432)),
-            'sslmode': 'require'
-        }
+        self.db_config = DB_CONFIG
+        self.crawl_time = None
     
     async def connect_db(self):
         """Connect to PostgreSQL database"""
@@ -77,7 +97,10 @@ class UniversalSmartCrawler:
     
     async def get_current_national_averages(self) -> Dict[str, Decimal]:
         """Get current national average prices for all products"""
-        cursor = self.connection.cursor(cursor_factory=RealDictCursor)
+        # Named (server-side) cursor streams the catalog in batches instead of
+        # buffering the whole national_brands table client-side
+        cursor = self.connection.cursor(name='national_averages', cursor_factory=RealDictCursor)
+        cursor.itersize = 5000
         
         cursor.execute("""
             SELECT product_id, national_average_price 
@@ -86,7 +109,7 @@ class UniversalSmartCrawler:
         """)
         
         national_prices = {}
-        for row in cursor.fetchall():
+        for row in cursor:
             national_prices[row['product_id']] = row['national_average_price']
         
         cursor.close()
@@ -110,56 +133,7 @@ class UniversalSmartCrawler:
         
         # For now, load from existing JSON files
         # In production, this would be actual web crawling
-        products = []
-          # Load from existing JSON files in data directory
-        data_dir = "crawlers/morrisons/crawler/data/branded"
-        
-        if os.path.exists(data_dir):
-            for category_file in os.listdir(data_dir):
-                if category_file.endswith('.json'):
-                    file_path = os.path.join(data_dir, category_file)
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            category_data = json.load(f)
-                        
-                        category_name = category_file.replace('.json', '').replace('_', ' ').title()
-                        
-                        for product in category_data:
-                            if 'name' in product and 'price' in product:
-                                try:
-                                    # Extract price from string format like "£2.75"
-                                    price_str = product['price'].replace('£', '').replace(',', '')
-                                    current_price = Decimal(price_str)
-                                    
-                                    # Generate product ID from name (simplified for demo)
-                                    product_id = f"morrisons_{hash(product['name']) % 1000000}"
-                                    
-                                    # Extract was_price from offer if it contains "was" (optional)
-                                    was_price = None
-                                    offer = product.get('offer', '')
-                                    if 'was' in offer.lower():
-                                        # Try to extract was price from offer text
-                                        import re
-                                        was_match = re.search(r'was\s*£?(\d+\.?\d*)', offer.lower())
-                                        if was_match:
-                                            was_price = Decimal(was_match.group(1))
-                                    
-                                    products.append(ProductPrice(
-                                        product_id=product_id,
-                                        name=product['name'],
-                                        current_price=current_price,
-                                        was_price=was_price,
-                                        price_per_unit=None,  # Not available in this format
-                                        category=category_name,
-                                        subcategory=None,
-                                        store_name='morrisons'
-                                    ))
-                                except (ValueError, TypeError) as e:
-                                    print(f"⚠️ Price parsing error for {product.get('name', 'unknown')}: {e}")
-                                    continue
-                    except Exception as e:
-                        print(f"⚠️ Error reading {category_file}: {e}")
-                        continue
+        products = self.load_branded_json_products('morrisons', "crawlers/morrisons/crawler/data/branded")
         
         print(f"🛒 Crawled {len(products)} Morrisons products")
         return products
@@ -175,61 +149,78 @@ class UniversalSmartCrawler:
         
         # For now, load from existing JSON files
         # In production, this would be actual web crawling
+        products = self.load_branded_json_products('asda', "crawlers/asda/crawler/data/branded")
+        
+        print(f"🛒 Crawled {len(products)} ASDA products")
+        return products
+    
+    @staticmethod
+    def _read_category_file(entry: os.DirEntry) -> Tuple[str, Optional[list], Optional[Exception]]:
+        """Read one category JSON file, returning the error instead of raising it"""
+        try:
+            with open(entry.path, 'r', encoding='utf-8') as f:
+                return entry.name, json.load(f), None
+        except Exception as e:
+            return entry.name, None, e
+    
+    def load_branded_json_products(self, store_key: str, data_dir: str) -> List[ProductPrice]:
+        """Load a store's branded products from its crawler's per-category JSON files"""
         products = []
         
-        # Load from existing JSON files in data directory
-        data_dir = "crawlers/asda/crawler/data/branded"
-        
-        if os.path.exists(data_dir):
-            for category_file in os.listdir(data_dir):
-                if category_file.endswith('.json'):
-                    file_path = os.path.join(data_dir, category_file)
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            category_data = json.load(f)
-                        
-                        category_name = category_file.replace('.json', '').replace('_', ' ').title()
-                        
-                        for product in category_data:
-                            if 'name' in product and 'price' in product:
-                                try:
-                                    # Extract price from string format like "£2.75"
-                                    price_str = product['price'].replace('£', '').replace(',', '')
-                                    current_price = Decimal(price_str)
-                                    
-                                    # Generate product ID from name (simplified for demo)
-                                    product_id = f"asda_{hash(product['name']) % 1000000}"
-                                    
-                                    # Extract was_price from offer if it contains "was" (optional)
-                                    was_price = None
-                                    offer = product.get('offer', '')
-                                    if 'was' in offer.lower():
-                                        # Try to extract was price from offer text
-                                        import re
-                                        was_match = re.search(r'was\s*£?(\d+\.?\d*)', offer.lower())
-                                        if was_match:
-                                            was_price = Decimal(was_match.group(1))
-                                    
-                                    products.append(ProductPrice(
-                                        product_id=product_id,
-                                        name=product['name'],
-                                        current_price=current_price,
-                                        was_price=was_price,
-                                        price_per_unit=None,  # Not available in this format
-                                        category=category_name,
-                                        subcategory=None,
-                                        store_name='asda'
-                                    ))
-                                except (ValueError, TypeError) as e:
-                                    print(f"⚠️ Price parsing error for {product.get('name', 'unknown')}: {e}")
-                                    continue
-                    except Exception as e:
-                        print(f"⚠️ Error reading {category_file}: {e}")
-                        continue
-        else:
-            print(f"⚠️ ASDA data directory not found: {data_dir}")
+        if not os.path.exists(data_dir):
+            print(f"⚠️ {store_key.upper()} data directory not found: {data_dir}")
+            return products
+        
+        with os.scandir(data_dir) as entries:
+            category_entries = [entry for entry in entries if entry.name.endswith('.json') and entry.is_file()]
+        
+        # Read and decode the category files concurrently; parsing below stays in file order
+        with ThreadPoolExecutor(max_workers=min(8, len(category_entries) or 1)) as executor:
+            loaded_files = list(executor.map(self._read_category_file, category_entries))
+        
+        for category_file, category_data, error in loaded_files:
+            if error:
+                print(f"⚠️ Error reading {category_file}: {error}")
+                continue
+            try:
+                category_name = category_file.replace('.json', '').replace('_', ' ').title()
+                
+                for product in category_data:
+                    if 'name' in product and 'price' in product:
+                        try:
+                            # Extract price from string format like "£2.75"
+                            price_str = product['price'].replace('£', '').replace(',', '')
+                            current_price = Decimal(price_str)
+                            
+                            # Generate product ID from name (simplified for demo)
+                            product_id = product_id_for(store_key, product['name'])
+                            
+                            # Extract was_price from offer if it contains "was" (optional)
+                            was_price = None
+                            offer = (product.get('offer') or '').lower()
+                            if 'was' in offer:
+                                # Try to extract was price from offer text
+                                was_match = WAS_PRICE_RE.search(offer)
+                                if was_match:
+                                    was_price = Decimal(was_match.group(1))
+                            
+                            products.append(ProductPrice(
+                                product_id=product_id,
+                                name=product['name'],
+                                current_price=current_price,
+                                was_price=was_price,
+                                price_per_unit=None,  # Not available in this format
+                                category=category_name,
+                                subcategory=None,
+                                store_name=store_key
+                            ))
+                        except (ValueError, TypeError) as e:
+                            print(f"⚠️ Price parsing error for {product.get('name', 'unknown')}: {e}")
+                            continue
+            except Exception as e:
+                print(f"⚠️ Error reading {category_file}: {e}")
+                continue
         
-        print(f"🛒 Crawled {len(products)} ASDA products")
         return products
     
     def calculate_new_national_averages(self, all_store_data: Dict[str, List[ProductPrice]]) -> Dict[str, Dict]:
@@ -253,8 +244,9 @@ class UniversalSmartCrawler:
                 product_aggregates[product.product_id]['prices'].append(product.current_price)
                 product_aggregates[product.product_id]['stores'].append(store_name)
         
-        # Calculate averages, min, max
+        # Calculate averages, min, max (stamped with the run's server timestamp)
         national_averages = {}
+        calculated_at = self.crawl_time
         for product_id, data in product_aggregates.items():
             prices = data['prices']
             
@@ -269,7 +261,7 @@ class UniversalSmartCrawler:
                 'lowest_price': min(prices),
                 'highest_price': max(prices),
                 'store_count': len(set(data['stores'])),
-                'last_updated': datetime.now()
+                'last_updated': calculated_at
             }
         
         print(f"📊 Calculated averages for {len(national_averages)} products")
@@ -281,51 +273,40 @@ class UniversalSmartCrawler:
         
         cursor = self.connection.cursor()
         
-        update_count = 0
-        insert_count = 0
+        rows = [
+            (
+                product_id,
+                data['name'],
+                data['category'],
+                data['subcategory'],
+                data['national_average_price'],
+                data['lowest_price'],
+                data['highest_price'],
+                data['store_count'],
+                data['last_updated']
+            )
+            for product_id, data in national_averages.items()
+        ]
+        
+        # Native upsert: existing products only get their price statistics refreshed.
+        # The conflict target is backed by the unique index added in aws_postgresql_migrations.sql.
+        # xmax = 0 on the returned row means it was freshly inserted.
+        results = execute_values(cursor, """
+            INSERT INTO national_brands 
+            (product_id, name, category, subcategory, national_average_price, 
+             lowest_price, highest_price, store_count, last_updated)
+            VALUES %s
+            ON CONFLICT (product_id) DO UPDATE SET
+                national_average_price = EXCLUDED.national_average_price,
+                lowest_price = EXCLUDED.lowest_price,
+                highest_price = EXCLUDED.highest_price,
+                store_count = EXCLUDED.store_count,
+                last_updated = EXCLUDED.last_updated
+            RETURNING (xmax = 0)
+        """, rows, page_size=1000, fetch=True)
         
-        for product_id, data in national_averages.items():
-            # Check if product exists
-            cursor.execute("SELECT product_id FROM national_brands WHERE product_id = %s", (product_id,))
-            
-            if cursor.fetchone():
-                # Update existing
-                cursor.execute("""
-                    UPDATE national_brands 
-                    SET national_average_price = %s,
-                        lowest_price = %s,
-                        highest_price = %s,
-                        store_count = %s,
-                        last_updated = %s
-                    WHERE product_id = %s
-                """, (
-                    data['national_average_price'],
-                    data['lowest_price'], 
-                    data['highest_price'],
-                    data['store_count'],
-                    data['last_updated'],
-                    product_id
-                ))
-                update_count += 1
-            else:
-                # Insert new
-                cursor.execute("""
-                    INSERT INTO national_brands 
-                    (product_id, name, category, subcategory, national_average_price, 
-                     lowest_price, highest_price, store_count, last_updated)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    product_id,
-                    data['name'],
-                    data['category'],
-                    data['subcategory'],
-                    data['national_average_price'],
-                    data['lowest_price'],
-                    data['highest_price'],
-                    data['store_count'],
-                    data['last_updated']
-                ))
-                insert_count += 1
+        insert_count = sum(1 for (inserted,) in results if inserted)
+        update_count = len(results) - insert_count
         
         self.connection.commit()
         cursor.close()
@@ -339,9 +320,16 @@ class UniversalSmartCrawler:
         cursor = self.connection.cursor()
         
         # Clear existing data for this store
-        cursor.execute(f"DELETE FROM {self.store_table}")
+        cursor.execute(sql.SQL("DELETE FROM {}").format(self.store_table_sql))
+        
+        copy_query = sql.SQL("""
+            COPY {}
+            (product_id, name, current_price, was_price, price_per_unit, 
+             category, subcategory, last_updated)
+            FROM STDIN WITH (FORMAT CSV, NULL '\\N')
+        """).format(self.store_table_sql)
         
-        different_prices = 0
+        rows = []
         
         for product in products:
             if product.product_id in national_averages:
@@ -349,12 +337,7 @@ class UniversalSmartCrawler:
                 
                 # Only store if price is different from national average
                 if product.current_price != national_price:
-                    cursor.execute(f"""
-                        INSERT INTO {self.store_table}
-                        (product_id, name, current_price, was_price, price_per_unit, 
-                         category, subcategory, last_updated)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                    """, (
+                    rows.append((
                         product.product_id,
                         product.name,
                         product.current_price,
@@ -362,9 +345,18 @@ class UniversalSmartCrawler:
                         product.price_per_unit,
                         product.category,
                         product.subcategory,
-                        datetime.now()
+                        self.crawl_time
                     ))
-                    different_prices += 1
+        
+        # The table was just emptied, so stream the rows in with COPY; None is written
+        # as an explicit \N marker so empty strings are not loaded as NULL
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(
+            [r'\N' if value is None else value for value in row] for row in rows
+        )
+        buffer.seek(0)
+        cursor.copy_expert(copy_query, buffer)
+        different_prices = len(rows)
         
         self.connection.commit()
         cursor.close()
@@ -400,7 +392,7 @@ class UniversalSmartCrawler:
         # Insert today's snapshot
         today = date.today()
         
-        cursor.execute(f"""
+        cursor.execute(sql.SQL("""
             INSERT INTO daily_price_snapshots 
             (snapshot_date, product_id, store_name, store_price, national_average_price, price_difference, is_cheapest)
             SELECT 
@@ -412,14 +404,14 @@ class UniversalSmartCrawler:
                 COALESCE(sp.current_price, nb.national_average_price) - nb.national_average_price as price_difference,
                 false as is_cheapest
             FROM national_brands nb
-            LEFT JOIN {self.store_table} sp ON nb.product_id = sp.product_id
+            LEFT JOIN {} sp ON nb.product_id = sp.product_id
             WHERE nb.national_average_price IS NOT NULL
             ON CONFLICT (snapshot_date, product_id, store_name) 
             DO UPDATE SET 
                 store_price = EXCLUDED.store_price,
                 national_average_price = EXCLUDED.national_average_price,
                 price_difference = EXCLUDED.price_difference
-        """, (today, self.store_name))
+        """).format(self.store_table_sql), (today, self.store_name))
         
         self.connection.commit()
         cursor.close()
@@ -435,6 +427,14 @@ class UniversalSmartCrawler:
             return False
         
         try:
+            # One server timestamp for the whole run, shared by national_brands and
+            # the store table so both come from the same clock and timezone
+            with self.connection.cursor() as cursor:
+                cursor.execute("SELECT now()")
+                self.crawl_time = cursor.fetchone()[0]
+            # Don't sit idle in a transaction while the store is crawled
+            self.connection.commit()
+            
             # 1. Crawl current store products
             products = await self.crawl_store_products()
             if not products:
@@ -126,6 +126,12 @@ except Exception as e:
     print("🔧 Please check your .env file AWS credentials")
     db_manager = None
 
+@app.on_event("shutdown")
+def close_database_pool():
+    """Release pooled database connections on shutdown"""
+    if db_manager:
+        db_manager.close()
+
 # Security models with basic validation
 class UserRegister(BaseModel):
     full_name: str
@@ -576,19 +582,20 @@ async def get_system_health():
     try:
         with db_manager.get_connection() as conn:
             with conn.cursor() as cur:
-                # Get database stats
-                cur.execute("SELECT COUNT(*) FROM users WHERE is_active = true")
-                active_users = cur.fetchone()[0]
-                
-                cur.execute("SELECT COUNT(*) FROM branded_products")
-                total_products = cur.fetchone()[0]
-                
-                cur.execute("SELECT COUNT(*) FROM store_prices")
-                total_prices = cur.fetchone()[0]
-                
-                cur.execute("SELECT COUNT(DISTINCT store_name) FROM store_prices")
-                total_stores = cur.fetchone()[0]
-                
+                # Get database stats in a single round-trip
+                cur.execute("""
+                    SELECT
+                        (SELECT COUNT(*) FROM users WHERE is_active = true),
+                        (SELECT COUNT(*) FROM branded_products),
+                        sp.total_prices,
+                        sp.total_stores
+                    FROM (
+                        SELECT COUNT(*) as total_prices, COUNT(DISTINCT store_name) as total_stores
+                        FROM store_prices
+                    ) sp
+                """)
+                active_users, total_products, total_prices, total_stores = cur.fetchone()
+
                 return {
                     "status": "healthy",
                     "timestamp": datetime.utcnow().isoformat(),
@@ -818,7 +825,7 @@ async def compare_stores(
                     FROM products p
                     LEFT JOIN promotions pr ON p.product_id = pr.product_id 
                         AND pr.is_active = true
-                    WHERE LOWER(p.product_name) LIKE LOWER(%s)
+                    WHERE p.product_name ILIKE %s
                     ORDER BY p.current_price ASC
                     LIMIT 20
                 """, (f"%{product_query}%",))